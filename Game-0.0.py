@@ -177,8 +177,141 @@ class Player(pygame.sprite.Sprite):
         self.damage += 5
 
 
+class FlowField:
+    # Общая карта направлений к игроку: считается один раз на клетку игрока, враги читают её за O(1)
+    NEIGHBOURS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+    def __init__(self, cell_size=30, clearance=60, separation_radius=None):
+        self.cell_size = cell_size
+        self.cols = WIDTH // cell_size + 1
+        self.rows = HEIGHT // cell_size + 1
+        self.clearance = clearance  # размер врага: камень раздувается на его половину с каждой стороны
+        self.blocked = set()
+        self.distance = {}
+        self.directions = {}
+        self.target_cell = None
+        self.separation_radius = separation_radius or clearance  # по умолчанию враги не заходят друг в друга
+        self.buckets = {}
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def in_bounds(self, cell):
+        return 0 <= cell[0] < self.cols and 0 <= cell[1] < self.rows
+
+    def set_obstacles(self, obstacles):
+        self.blocked = set()
+        for obstacle in obstacles:
+            rect = obstacle.rect.inflate(self.clearance, self.clearance)
+            left, top = self.cell_of(rect.left, rect.top)
+            right, bottom = self.cell_of(rect.right - 1, rect.bottom - 1)
+            for cx in range(left, right + 1):
+                for cy in range(top, bottom + 1):
+                    if self.in_bounds((cx, cy)):
+                        self.blocked.add((cx, cy))
+        self.target_cell = None
+
+    def update(self, target, crowd=None):
+        if crowd is not None:
+            self.buckets = {}
+            for sprite in crowd:
+                self.buckets.setdefault(self.cell_of(*sprite.rect.center), []).append(sprite)
+        cell = self.cell_of(*target.rect.center)
+        if cell == self.target_cell:
+            return
+        self.target_cell = cell
+        self.rebuild()
+
+    def rebuild(self):
+        self.distance = {self.target_cell: 0}
+        frontier = [self.target_cell]
+        while frontier:
+            next_frontier = []
+            for cx, cy in frontier:
+                for dx, dy in self.NEIGHBOURS[:4]:
+                    cell = (cx + dx, cy + dy)
+                    if cell in self.distance or not self.in_bounds(cell):
+                        continue
+                    # Если игрок стоит у камня, заходим в камень только из его же зоны — последний подход к игроку
+                    if cell in self.blocked and (cx, cy) not in self.blocked:
+                        continue
+                    self.distance[cell] = self.distance[(cx, cy)] + 1
+                    next_frontier.append(cell)
+            frontier = next_frontier
+
+        self.directions = {}
+        for (cx, cy), dist in self.distance.items():
+            best = None
+            best_dist = dist
+            for dx, dy in self.NEIGHBOURS:
+                cell = (cx + dx, cy + dy)
+                if cell not in self.distance or self.distance[cell] >= best_dist:
+                    continue
+                # Не срезаем углы камней по диагонали
+                if dx and dy and ((cx + dx, cy) in self.blocked or (cx, cy + dy) in self.blocked):
+                    continue
+                best = (dx, dy)
+                best_dist = self.distance[cell]
+            if best:
+                length = math.sqrt(best[0] ** 2 + best[1] ** 2)
+                self.directions[(cx, cy)] = (best[0] / length, best[1] / length)
+
+        # Из камней и закрытых карманов выводим к ближайшей достижимой клетке, а не сквозь камень к игроку
+        visited = set(self.distance)
+        frontier = list(self.distance)
+        while frontier:
+            next_frontier = []
+            for cx, cy in frontier:
+                for dx, dy in self.NEIGHBOURS[:4]:
+                    cell = (cx + dx, cy + dy)
+                    if cell in visited or not self.in_bounds(cell):
+                        continue
+                    visited.add(cell)
+                    self.directions[cell] = (-dx, -dy)
+                    next_frontier.append(cell)
+            frontier = next_frontier
+
+    def direction(self, x, y):
+        if self.cell_of(x, y) not in self.directions:
+            return None
+        # Смешиваем направления четырёх соседних клеток, чтобы на границах клеток враги не дёргались
+        fx = x / self.cell_size - 0.5
+        fy = y / self.cell_size - 0.5
+        left, top = math.floor(fx), math.floor(fy)
+        tx, ty = fx - left, fy - top
+        sum_x, sum_y, total = 0, 0, 0
+        for cx, cy, weight in ((left, top, (1 - tx) * (1 - ty)), (left + 1, top, tx * (1 - ty)),
+                               (left, top + 1, (1 - tx) * ty), (left + 1, top + 1, tx * ty)):
+            flow = self.directions.get((cx, cy))
+            if flow:
+                sum_x += flow[0] * weight
+                sum_y += flow[1] * weight
+                total += weight
+        return sum_x / total, sum_y / total
+
+    def separation(self, sprite):
+        push_x, push_y = 0, 0
+        cx, cy = self.cell_of(*sprite.rect.center)
+        reach = math.ceil(self.separation_radius / self.cell_size)
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                for other in self.buckets.get((cx + dx, cy + dy), ()):
+                    if other is sprite:
+                        continue
+                    ox = sprite.rect.centerx - other.rect.centerx
+                    oy = sprite.rect.centery - other.rect.centery
+                    distance = math.sqrt(ox ** 2 + oy ** 2)
+                    if distance == 0:
+                        ox, oy, distance = random.uniform(-1, 1), random.uniform(-1, 1), 1
+                    if distance < self.separation_radius:
+                        weight = (self.separation_radius - distance) / self.separation_radius
+                        push_x += ox / distance * weight
+                        push_y += oy / distance * weight
+        return push_x, push_y
+
+
 class Enemy(pygame.sprite.Sprite):
-    def __init__(self, difficulty, player):
+    def __init__(self, difficulty, player, flow_field=None):
         super().__init__()
         self.original_image = pygame.image.load("imoge/Vrag_ryadovoy.png").convert_alpha()
         self.image = pygame.transform.scale(self.original_image, (60, 60))
@@ -188,16 +321,32 @@ class Enemy(pygame.sprite.Sprite):
         self.damage = 5 * difficulty
         self.speed = 2 + difficulty
         self.player = player
+        self.flow_field = flow_field
         self.animation_frame = 0
 
     def update(self):
-        player_x, player_y = self.player.rect.center
-        dx = player_x - self.rect.centerx
-        dy = player_y - self.rect.centery
+        flow = self.flow_field.direction(*self.rect.center) if self.flow_field else None
+        if flow:
+            dx, dy = flow
+        else:
+            # В клетке игрока (или вне карты) идём прямо на него
+            player_x, player_y = self.player.rect.center
+            dx = player_x - self.rect.centerx
+            dy = player_y - self.rect.centery
+            distance = math.sqrt(dx**2 + dy**2)
+            if distance != 0:
+                # Вблизи игрока тянемся слабее: не проскакиваем его и даём отталкиванию развести врагов вокруг
+                arrive = self.flow_field.clearance / 2 if self.flow_field else 0
+                dx, dy = dx / max(distance, arrive), dy / max(distance, arrive)
+        if self.flow_field:
+            push_x, push_y = self.flow_field.separation(self)
+            dx += push_x
+            dy += push_y
         distance = math.sqrt(dx**2 + dy**2)
         if distance != 0:
-            dx = (dx / distance) * self.speed
-            dy = (dy / distance) * self.speed
+            # Когда притяжение и отталкивание гасят друг друга, шаг короче — враги не дрожат
+            dx = (dx / max(distance, 1)) * self.speed
+            dy = (dy / max(distance, 1)) * self.speed
         self.rect.x += dx
         self.rect.y += dy
 
@@ -530,10 +679,15 @@ def main():
     all_sprites = pygame.sprite.Group()
     all_sprites.add(player)
 
+    rocks = []
     for _ in range(15):
         rock = Decor("rock")
         decor.add(rock)
         all_sprites.add(rock)
+        rocks.append(rock)
+
+    flow_field = FlowField()
+    flow_field.set_obstacles(rocks)
 
     for _ in range(10):
         grass = Decor("grass")
@@ -546,7 +700,7 @@ def main():
         all_sprites.add(particle)
 
     for _ in range(5):
-        enemy = Enemy(difficulty, player)
+        enemy = Enemy(difficulty, player, flow_field)
         enemies.add(enemy)
         all_sprites.add(enemy)
 
@@ -581,6 +735,7 @@ def main():
 
         keys = pygame.key.get_pressed()
         player.update(keys)
+        flow_field.update(player, enemies)
         enemies.update()
         artifacts.update()
         decor.update()
@@ -617,7 +772,7 @@ def main():
             wave += 1
             show_dialog(f"Волна {wave} пройдена!")
             for _ in range(5 + wave):
-                enemy = Enemy(difficulty, player)
+                enemy = Enemy(difficulty, player, flow_field)
                 enemies.add(enemy)
                 all_sprites.add(enemy)
 